@@ -1,12 +1,17 @@
 import re
-import json
-import requests
+import orjson
+import time
+import httpx
 import asyncio
-from typing import List, Dict, Any
+import functools
+import hashlib
+from collections import Counter
+from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from fastapi import HTTPException
 import logging
-from multiprocessing.pool import ThreadPool
+import ahocorasick
+from cachetools import LRUCache
 import nltk
 from nltk.corpus import stopwords
 
@@ -24,11 +29,28 @@ def setup_nltk():
             nltk.download('stopwords', quiet=True)
             return True
         except Exception as e:
-            logger.warning(f"Failed to download NLTK data: {str(e)}")
+            logger.warning("Failed to download NLTK data: %s", e)
             return False
 
 NLTK_AVAILABLE = setup_nltk()
 
+@functools.lru_cache(maxsize=1)
+def _stopwords() -> frozenset:
+    if not NLTK_AVAILABLE:
+        return frozenset()
+    try:
+        return frozenset(stopwords.words('english'))
+    except Exception:
+        return frozenset()
+
+# Precompiled patterns for prompt/response parsing
+_JOB_RE = re.compile(r"JOB:?\s*(.*?)(?:RESUME:|$)", re.DOTALL | re.IGNORECASE)
+_RESUME_RE = re.compile(r"RESUME:?\s*(.*?)$", re.DOTALL | re.IGNORECASE)
+_EXP_RE = re.compile(r"EXPERIENCE:?\s*(.*?)(?:JOB:|$)", re.DOTALL | re.IGNORECASE)
+_SECTION_SPLIT_RE = re.compile(r'\n\s*\n|(?=ORIGINAL:)')
+_IMPACT_RE = re.compile(r'\d+')
+_TOKEN_RE = re.compile(r'[a-z0-9\.\+#]+')
+
 @dataclass
 class Keyword:
     keyword: str
@@ -45,32 +67,46 @@ class BulletImprovement:
 
 class AIAnalyzer:
     def __init__(self):
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama_url = "http://localhost:11434"
+        self.client = httpx.AsyncClient(
+            base_url=self.ollama_url,
+            timeout=5.0,  # Reduced timeout
+            limits=httpx.Limits(max_keepalive_connections=8, keepalive_expiry=60)
+        )
+        self._ollama_ok_until: float = 0.0
+        self._ollama_ok_ttl = 30.0  # Seconds to trust a healthy probe/generate
+        # Low-temperature output is effectively deterministic, so reuse it per prompt
+        self._llm_cache = LRUCache(maxsize=256)
+        self._llm_in_flight: Dict[bytes, asyncio.Event] = {}
         self.model = "llama3:8b"
         self.tech_keywords = [
             "python", "javascript", "react", "nodejs", "node.js", "java",
             "aws", "docker", "sql", "git", "agile", "typescript",
             "kubernetes", "mongodb", "express", "angular", "vue"
         ]
-        self.stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
-        if NLTK_AVAILABLE:
-            try:
-                self.stop_words = set(stopwords.words('english'))
-            except:
-                pass
-        self.thread_pool = ThreadPool(processes=5)
+        # Single-pass keyword scanner over job/resume text
+        self.keyword_automaton = ahocorasick.Automaton()
+        for keyword in self.tech_keywords:
+            self.keyword_automaton.add_word(keyword.lower(), keyword)
+        self.keyword_automaton.make_automaton()
+        self.stop_words = _stopwords() or frozenset(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
+
+    async def close(self) -> None:
+        await self.client.aclose()
 
     async def test_ollama_connection(self) -> bool:
+        if time.monotonic() < self._ollama_ok_until:
+            return True
         try:
-            response = await asyncio.to_thread(
-                requests.get, self.ollama_url.replace('/generate', '/tags'), timeout=2
-            )
+            response = await self.client.get("/api/tags", timeout=2)
             if response.status_code == 200:
-                models = response.json().get('models', [])
-                return any('llama3' in model.get('name', '') for model in models)
+                models = orjson.loads(response.content).get('models', [])
+                if any('llama3' in model.get('name', '') for model in models):
+                    self._ollama_ok_until = time.monotonic() + self._ollama_ok_ttl
+                    return True
             return False
         except Exception as e:
-            logger.warning(f"Ollama connection test failed: {str(e)}")
+            logger.warning("Ollama connection test failed: %s", e)
             return False
 
     async def analyze_with_ollama(self, prompt: str, max_retries: int = 1) -> str:
@@ -78,19 +114,44 @@ class AIAnalyzer:
             logger.info("Short input, using fallback analysis")
             return self.fallback_analysis(prompt)
         
+        ollama_prompt = prompt[:500] + "..." if len(prompt) > 500 else prompt
+        cache_key = hashlib.blake2b(f"{self.model}\0{ollama_prompt}".encode(), digest_size=16).digest()
+        cached = self._llm_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Ollama cache hit")
+            return cached
+        
+        # Coalesce identical concurrent requests onto the one already in flight
+        in_flight = self._llm_in_flight.get(cache_key)
+        if in_flight is not None:
+            await in_flight.wait()
+            cached = self._llm_cache.get(cache_key)
+            return cached if cached is not None else self.fallback_analysis(prompt)
+        
+        event = self._llm_in_flight[cache_key] = asyncio.Event()
+        try:
+            response_text = await self._generate_with_ollama(ollama_prompt, max_retries)
+            if response_text is not None:
+                self._llm_cache[cache_key] = response_text
+        finally:
+            del self._llm_in_flight[cache_key]
+            event.set()
+        
+        return response_text if response_text is not None else self.fallback_analysis(prompt)
+
+    async def _generate_with_ollama(self, prompt: str, max_retries: int) -> Optional[str]:
         if not await self.test_ollama_connection():
             logger.warning("Ollama not available, using fallback")
-            return self.fallback_analysis(prompt)
+            return None
         
-        prompt = prompt[:500] + "..." if len(prompt) > 500 else prompt
-        logger.info(f"Sending Ollama request (prompt length: {len(prompt)})");
+        logger.info("Sending Ollama request (prompt length: %d)", len(prompt))
 
         for attempt in range(max_retries + 1):
             try:
-                response = await asyncio.to_thread(
-                    requests.post,
-                    self.ollama_url,
-                    json={
+                response = await self.client.post(
+                    "/api/generate",
+                    headers={"Content-Type": "application/json"},
+                    content=orjson.dumps({
                         "model": self.model,
                         "prompt": prompt,
                         "stream": False,
@@ -100,21 +161,23 @@ class AIAnalyzer:
                             "num_predict": 64,  # Reduced for speed
                             "num_ctx": 256
                         }
-                    },
-                    timeout=5  # Reduced timeout
+                    })
                 )
                 if response.status_code == 200:
-                    result = response.json()
+                    result = orjson.loads(response.content)
                     response_text = result.get('response', '').strip()
-                    logger.info(f"Ollama response length: {len(response_text)}")
+                    logger.info("Ollama response length: %d", len(response_text))
+                    self._ollama_ok_until = time.monotonic() + self._ollama_ok_ttl
                     return response_text
+                self._ollama_ok_until = 0.0
             except Exception as e:
-                logger.warning(f"Ollama request failed (attempt {attempt + 1}): {str(e)}")
+                self._ollama_ok_until = 0.0
+                logger.warning("Ollama request failed (attempt %d): %s", attempt + 1, e)
             if attempt < max_retries:
                 await asyncio.sleep(0.5)
         
         logger.warning("Ollama failed, using fallback")
-        return self.fallback_analysis(prompt)
+        return None
 
     def fallback_analysis(self, prompt: str) -> str:
         logger.info("Using fallback analysis")
@@ -125,13 +188,13 @@ class AIAnalyzer:
                 return self._fallback_bullet_analysis(prompt)
             return "No analysis available"
         except Exception as e:
-            logger.error(f"Fallback analysis error: {str(e)}")
+            logger.exception("Fallback analysis error: %s", e)
             return "Analysis failed"
 
     def _fallback_keyword_analysis(self, prompt: str) -> str:
         try:
-            job_match = re.search(r"JOB:?\s*(.*?)(?:RESUME:|$)", prompt, re.DOTALL | re.IGNORECASE)
-            resume_match = re.search(r"RESUME:?\s*(.*?)$", prompt, re.DOTALL | re.IGNORECASE)
+            job_match = _JOB_RE.search(prompt)
+            resume_match = _RESUME_RE.search(prompt)
             
             job_desc = job_match.group(1).strip().lower()[:200] if job_match else ""
             resume_text = resume_match.group(1).strip().lower()[:200] if resume_match else ""
@@ -139,21 +202,24 @@ class AIAnalyzer:
             if not job_desc:
                 return "None|low|0|No job description provided"
             
+            job_counts = Counter(keyword for _, keyword in self.keyword_automaton.iter(job_desc))
+            resume_counts = Counter(keyword for _, keyword in self.keyword_automaton.iter(resume_text))
+            
             missing_keywords = []
             for keyword in self.tech_keywords:
-                if keyword.lower() in job_desc and keyword.lower() not in resume_text:
-                    freq = job_desc.count(keyword.lower())
+                if job_counts[keyword] and not resume_counts[keyword]:
+                    freq = job_counts[keyword]
                     importance = "high" if freq > 2 else "medium" if freq > 1 else "low"
                     missing_keywords.append(f"{keyword}|{importance}|{freq}|Required skill")
             
             return "\n".join(missing_keywords[:3]) or "None|low|0|All key skills present"
         except Exception as e:
-            logger.error(f"Fallback keyword analysis error: {str(e)}")
+            logger.exception("Fallback keyword analysis error: %s", e)
             return "Analysis error|low|0|Could not analyze keywords"
 
     def _fallback_bullet_analysis(self, prompt: str) -> str:
         try:
-            exp_match = re.search(r"EXPERIENCE:?\s*(.*?)(?:JOB:|$)", prompt, re.DOTALL | re.IGNORECASE)
+            exp_match = _EXP_RE.search(prompt)
             experience = exp_match.group(1).strip()[:100] if exp_match else ""
             
             bullets = [line.lstrip('•- ').strip() for line in experience.split('\n') if line.strip() and (line.startswith('•') or line.startswith('-'))]
@@ -165,7 +231,7 @@ class AIAnalyzer:
             improved = f"Enhanced {original.lower()} with modern technologies"
             return f"ORIGINAL: {original}\nIMPROVED: {improved}\nREASON: Added impact\nIMPACT: 8"
         except Exception as e:
-            logger.error(f"Fallback bullet analysis error: {str(e)}")
+            logger.exception("Fallback bullet analysis error: %s", e)
             return "ORIGINAL: Work experience\nIMPROVED: Delivered impactful work\nREASON: Added action verb\nIMPACT: 5"
 
     def parse_keywords(self, response: str) -> List[Keyword]:
@@ -178,15 +244,14 @@ class AIAnalyzer:
             if not line or '|' not in line:
                 continue
             parts = [p.strip() for p in line.split('|')]
-            if len(parts) >= 3:
-                try:
-                    keyword = parts[0]
-                    importance = parts[1].lower() if parts[1].lower() in ['high', 'medium', 'low'] else 'medium'
-                    frequency = int(parts[2]) if parts[2].isdigit() else 1
-                    context = parts[3] if len(parts) > 3 else f"{keyword} skill"
-                    keywords.append(Keyword(keyword, importance, frequency, context))
-                except (ValueError, IndexError) as e:
-                    logger.warning(f"Error parsing keyword: {str(e)}")
+            if len(parts) < 3:
+                logger.warning("Skipping malformed keyword line: %s", line)
+                continue
+            keyword = parts[0]
+            importance = parts[1].lower() if parts[1].lower() in ['high', 'medium', 'low'] else 'medium'
+            frequency = int(parts[2]) if parts[2].isdecimal() else 1
+            context = parts[3] if len(parts) > 3 else f"{keyword} skill"
+            keywords.append(Keyword(keyword, importance, frequency, context))
         
         return keywords or [Keyword("None", "low", 0, "No keywords identified")]
 
@@ -195,7 +260,7 @@ class AIAnalyzer:
         if not response or response.strip() == "":
             return [BulletImprovement("No experience", "Enhanced experience", "Added language", 5)]
         
-        sections = re.split(r'\n\s*\n|(?=ORIGINAL:)', response)
+        sections = _SECTION_SPLIT_RE.split(response)
         for section in sections:
             if not section.strip():
                 continue
@@ -210,9 +275,8 @@ class AIAnalyzer:
                 elif line.startswith('REASON:'):
                     reason = line.replace('REASON:', '').strip()
                 elif line.startswith('IMPACT:'):
-                    impact_str = re.findall(r'\d+', line)
-                    if impact_str:
-                        impact_score = min(int(impact_str[0]), 10)
+                    if impact := _IMPACT_RE.search(line):
+                        impact_score = min(int(impact.group()), 10)
             if original and improved:
                 improvements.append(BulletImprovement(original, improved, reason or "Enhanced impact", impact_score))
         
@@ -224,7 +288,7 @@ class AIAnalyzer:
             response = await self.analyze_with_ollama(prompt)
             return self.parse_keywords(response)
         except Exception as e:
-            logger.error(f"Keyword extraction error: {str(e)}")
+            logger.exception("Keyword extraction error: %s", e)
             return [Keyword("Analysis Error", "low", 0, "Could not analyze")]
 
     async def improve_bullets_advanced(self, resume_sections: Dict[str, str], job_description: str) -> List[BulletImprovement]:
@@ -238,12 +302,13 @@ class AIAnalyzer:
             response = await self.analyze_with_ollama(prompt)
             return self.parse_improvements(response)
         except Exception as e:
-            logger.error(f"Bullet improvement error: {str(e)}")
+            logger.exception("Bullet improvement error: %s", e)
             return [BulletImprovement("Experience", "Enhanced experience", "Improved clarity", 6)]
 
     async def calculate_advanced_match_score(self, resume_text: str, keywords: List[Keyword], job_description: str) -> Dict[str, Any]:
         try:
             resume_lower = resume_text.lower()[:200]
+            resume_tokens = set(_TOKEN_RE.findall(resume_lower))
             job_lower = job_description.lower()[:200]
             
             matched_keywords = 0
@@ -251,11 +316,13 @@ class AIAnalyzer:
             keyword_details = []
             
             for keyword in keywords:
-                if keyword.keyword.lower() in ["none", "analysis error"]:
+                kw = keyword.keyword.lower()
+                if kw in ["none", "analysis error"]:
                     continue
                 weight = {'high': 3, 'medium': 2, 'low': 1}.get(keyword.importance, 2) * keyword.frequency
                 total_weight += weight
-                is_matched = keyword.keyword.lower() in resume_lower
+                # Token lookup covers single-word skills; substring search handles the rest
+                is_matched = kw in resume_tokens or kw in resume_lower
                 if is_matched:
                     matched_keywords += weight
                 keyword_details.append({
@@ -282,7 +349,7 @@ class AIAnalyzer:
                 'recommendations': recommendations
             }
         except Exception as e:
-            logger.error(f"Match score error: {str(e)}")
+            logger.exception("Match score error: %s", e)
             return {
                 'overall_score': 50,
                 'keyword_score': 50,
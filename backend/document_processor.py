@@ -1,8 +1,7 @@
 import pdfplumber
 import docx
-import io
 import re
-from typing import Dict
+from typing import BinaryIO, Dict
 from fastapi import HTTPException
 import logging
 
@@ -10,6 +9,11 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_SENTENCE_PUNCT_RE = re.compile(r'[.!?]')
+
+# Endpoints reject resumes whose cleaned text is longer than this
+MAX_TEXT_CHARS = 10000
+
 class DocumentProcessor:
     def __init__(self):
         self.section_keywords = {
@@ -18,9 +22,15 @@ class DocumentProcessor:
             'education': ['education', 'degree', 'university', 'academic'],
             'summary': ['summary', 'contact', 'objective', 'profile']
         }
+        # Single alternation over all section keywords (suffixes like "Experiences" allowed),
+        # mapped back to section names; earlier sections win when several keywords match.
+        # Lines are lowercased before matching, so no IGNORECASE: it would let 'ſ'/'ı'
+        # match 's'/'i' and yield text that isn't a key in _kw_to_section
+        self._kw_to_section = {kw: sec for sec, kws in self.section_keywords.items() for kw in kws}
+        self._section_order = {sec: i for i, sec in enumerate(self.section_keywords)}
+        self._section_re = re.compile(r'\b(' + '|'.join(map(re.escape, self._kw_to_section)) + r')\w*')
         # Precompile regex patterns
         self.space_regex = re.compile(r'\s+')
-        self.char_regex = re.compile(r'[^\w\s\-\.,;@()]')
         self.replacements = {
             'ReactJS': 'React',
             'NodeJS': 'Node.js',
@@ -30,69 +40,78 @@ class DocumentProcessor:
             'NODE': 'Node.js',
             'Typescript': 'TypeScript',
         }
+        # One pass over the text: whitespace runs, disallowed chars, then known terms
+        # (spaces inside terms match any whitespace run, as if collapsed first)
+        terms = '|'.join(re.escape(k).replace(r'\ ', r'\s+') for k in self.replacements)
+        self.clean_regex = re.compile(r'(\s+)|([^\w\s\-\.,;@()])|(' + terms + ')')
 
-    def extract_text_from_pdf(self, content: bytes) -> str:
+    def extract_text_from_pdf(self, file: BinaryIO) -> str:
         try:
-            with pdfplumber.open(io.BytesIO(content)) as pdf:
-                text = ""
+            cleaned_parts = []
+            total = 0
+            with pdfplumber.open(file) as pdf:
                 # Process only first 2 pages to improve speed
                 for page in pdf.pages[:2]:
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\n"
-            logger.info(f"Extracted PDF text length: {len(text)} chars")
-            if not text.strip():
+                    # Clean per page; joining cleaned pages with a space matches cleaning the joined text
+                    page_text = self.clean_text(page.extract_text() or "")
+                    if page_text:
+                        cleaned_parts.append(page_text)
+                    # Stop on cleaned length so the downstream limit still sees an over-long resume
+                    total += len(page_text)
+                    if total > MAX_TEXT_CHARS:
+                        break
+            text = " ".join(cleaned_parts)
+            logger.info("Extracted PDF text length: %d chars", len(text))
+            if not text:
                 raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
-            return self.clean_text(text)
+            return text
         except Exception as e:
-            logger.error(f"PDF extraction error: {str(e)}")
+            logger.exception("PDF extraction error: %s", e)
             raise HTTPException(status_code=400, detail=f"Error extracting PDF: {str(e)}")
 
-    def extract_text_from_docx(self, content: bytes) -> str:
+    def extract_text_from_docx(self, file: BinaryIO) -> str:
         try:
-            doc = docx.Document(io.BytesIO(content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            logger.info(f"Extracted DOCX text length: {len(text)} chars")
+            doc = docx.Document(file)
+            text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
+            logger.info("Extracted DOCX text length: %d chars", len(text))
             if not text.strip():
                 raise HTTPException(status_code=400, detail="Failed to extract text from DOCX")
             return self.clean_text(text)
         except Exception as e:
-            logger.error(f"DOCX extraction error: {str(e)}")
+            logger.exception("DOCX extraction error: %s", e)
             raise HTTPException(status_code=400, detail=f"Error extracting DOCX: {str(e)}")
 
     def clean_text(self, text: str) -> str:
-        text = self.space_regex.sub(' ', text)
-        text = self.char_regex.sub(' ', text)
-        for old, new in self.replacements.items():
-            text = text.replace(old, new)
-        return text.strip()
+        return self.clean_regex.sub(self._clean_match, text).strip()
+
+    def _clean_match(self, match: re.Match) -> str:
+        term = match.group(3)
+        if term is None:
+            return ' '
+        return self.replacements[self.space_regex.sub(' ', term)]
 
     def parse_resume_sections(self, text: str) -> Dict[str, str]:
-        sections = {k: '' for k in self.section_keywords}
-        lines = text.split('\n')
+        sections = {k: [] for k in self.section_keywords}
         current_section = 'summary'
 
-        for line in lines:
+        # Lowercase once up front rather than once per line
+        for line, line_lower in zip(text.split('\n'), text.lower().split('\n')):
             line = line.strip()
             if not line:
                 continue
 
-            line_lower = line.lower()
+            line_lower = line_lower.strip()
             section_detected = False
 
-            for section, keywords in self.section_keywords.items():
-                if any(keyword in line_lower for keyword in keywords):
-                    if len(line) < 60 and (line.isupper() or not re.search(r'[.!?]', line)):
-                        current_section = section
-                        section_detected = True
-                        break
+            matched = {self._kw_to_section[m.group(1)] for m in self._section_re.finditer(line_lower)}
+            if matched and len(line) < 60 and (line.isupper() or not _SENTENCE_PUNCT_RE.search(line)):
+                current_section = min(matched, key=self._section_order.__getitem__)
+                section_detected = True
 
             if not section_detected:
-                sections[current_section] += line + '\n'
+                sections[current_section].append(line)
 
-        for section in sections:
-            sections[section] = sections[section].strip()
+        sections = {k: '\n'.join(v).strip() for k, v in sections.items()}
         
-        logger.info(f"Parsed sections: {list(sections.keys())}")
+        logger.info("Parsed sections: %s", list(sections.keys()))
         return sections
\ No newline at end of file
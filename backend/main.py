@@ -1,21 +1,96 @@
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-import io
-import json
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import os
+import shutil
+import tempfile
+import re
+import orjson
 import asyncio
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from datetime import datetime
 import uuid
+import hashlib
 import logging
-from document_processor import DocumentProcessor
+import threading
+from cachetools import TTLCache
+from document_processor import DocumentProcessor, MAX_TEXT_CHARS
 from ai_analyzer import AIAnalyzer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="AI Resume Enhancer", version="1.0.0")
+_BULLET_PREFIX_RE = re.compile(r'^\s*[•-]\s*')
+
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+class UploadTooLarge(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=413, detail="File size exceeds 5MB limit")
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized uploads by Content-Length, or mid-stream once the body passes the cap."""
+
+    def __init__(self, app: ASGIApp, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            logger.error("Upload rejected, Content-Length too large: %s bytes", content_length)
+            await self.reject(scope, receive, send)
+            return
+
+        # Chunked uploads carry no Content-Length, so count body bytes as they arrive
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    logger.error("Upload rejected, body exceeded %d bytes", self.max_bytes)
+                    raise UploadTooLarge()
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge:
+            # FastAPI normally renders this itself; only answer if nothing was sent yet
+            if response_started:
+                raise
+            await self.reject(scope, receive, send)
+
+    async def reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = ORJSONResponse(status_code=413, content={"detail": "File size exceeds 5MB limit"})
+        await response(scope, receive, send)
+
+app = FastAPI(title="AI Resume Enhancer", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Added before CORS so it sits inside it and rejections still carry CORS headers
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/api/upload-resume",
+    max_bytes=MAX_UPLOAD_BYTES + UPLOAD_OVERHEAD_BYTES,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,69 +117,113 @@ class BulletImprovement:
 doc_processor = DocumentProcessor()
 ai_analyzer = AIAnalyzer()
 
-upload_results = {}
-analysis_results = {}
+@app.on_event("shutdown")
+async def shutdown_event():
+    await ai_analyzer.close()
+
+# Task results expire on their own so clients that never poll can't leak memory
+TASK_RESULTS_MAXSIZE = 1024
+TASK_RESULTS_TTL = 600
+upload_results = TTLCache(maxsize=TASK_RESULTS_MAXSIZE, ttl=TASK_RESULTS_TTL)
+analysis_results = TTLCache(maxsize=TASK_RESULTS_MAXSIZE, ttl=TASK_RESULTS_TTL)
+results_lock = threading.Lock()
+
+def set_task_result(results: TTLCache, task_id: str, value: Dict[str, Any]) -> None:
+    with results_lock:
+        results[task_id] = value
+        if len(results) >= TASK_RESULTS_MAXSIZE * 0.9:
+            logger.warning("Task result cache near capacity: %d/%d", len(results), TASK_RESULTS_MAXSIZE)
+
+def get_task_result(results: TTLCache, task_id: str) -> Optional[Dict[str, Any]]:
+    with results_lock:
+        result = results.get(task_id)
+        if result is not None and result["status"] in ["completed", "failed"]:
+            results.pop(task_id, None)
+        return result
+
+# Parsed sections keyed by resume content hash, shared across endpoints
+_SECTIONS_CACHE = TTLCache(maxsize=512, ttl=600)
+
+def sections_for(text: str) -> Dict[str, str]:
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    sections = _SECTIONS_CACHE.get(key)
+    if sections is None:
+        sections = doc_processor.parse_resume_sections(text)
+        _SECTIONS_CACHE[key] = sections
+    return sections
 
 @app.post("/api/upload-resume")
 async def upload_resume(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
-    logger.info(f"Received upload request for file: {file.filename}")
+    logger.info("Received upload request for file: %s", file.filename)
     
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
     if not file.filename.lower().endswith(('.pdf', '.docx', '.doc')):
-        logger.error(f"Unsupported file type: {file.filename}")
+        logger.error("Unsupported file type: %s", file.filename)
         raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
     
-    content = await file.read()
-    if len(content) > 5 * 1024 * 1024:
-        logger.error(f"File too large: {len(content)} bytes")
-        raise HTTPException(status_code=400, detail="File size exceeds 5MB limit")
+    # Size the spooled upload in place instead of reading it into memory
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    if size > MAX_UPLOAD_BYTES:
+        logger.error("File too large: %d bytes", size)
+        raise HTTPException(status_code=413, detail="File size exceeds 5MB limit")
+
+    # Request-scoped upload files may be closed before background tasks run, so
+    # copy the upload into a temp file that process_upload owns and closes
+    upload_copy = tempfile.TemporaryFile()
+    try:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, upload_copy)
+        upload_copy.seek(0)
+    except Exception:
+        upload_copy.close()
+        raise
+    filename = file.filename
 
     task_id = str(uuid.uuid4())
-    upload_results[task_id] = {"status": "processing", "result": None}
+    set_task_result(upload_results, task_id, {"status": "processing", "result": None})
     
     async def process_upload():
         try:
-            if file.filename.lower().endswith('.pdf'):
-                text = doc_processor.extract_text_from_pdf(content)
+            if filename.lower().endswith('.pdf'):
+                text = await asyncio.to_thread(doc_processor.extract_text_from_pdf, upload_copy)
             else:
-                text = doc_processor.extract_text_from_docx(content)
+                text = await asyncio.to_thread(doc_processor.extract_text_from_docx, upload_copy)
             
-            if len(text) > 10000:
-                logger.error(f"Extracted text too long: {len(text)} chars")
-                raise HTTPException(status_code=400, detail="Resume text exceeds 10000 characters")
+            if len(text) > MAX_TEXT_CHARS:
+                logger.error("Extracted text too long: %d chars", len(text))
+                raise HTTPException(status_code=400, detail=f"Resume text exceeds {MAX_TEXT_CHARS} characters")
             
             if not text.strip():
                 raise HTTPException(status_code=400, detail="Could not extract text from the uploaded file")
             
-            sections = doc_processor.parse_resume_sections(text)
+            sections = sections_for(text)
             
-            upload_results[task_id] = {
+            set_task_result(upload_results, task_id, {
                 "status": "completed",
                 "result": {
-                    "filename": file.filename,
+                    "filename": filename,
                     "text": text,
                     "sections": sections
                 }
-            }
+            })
         except Exception as e:
-            logger.error(f"Upload processing error: {str(e)}")
-            upload_results[task_id] = {"status": "failed", "error": str(e)}
+            logger.exception("Upload processing error: %s", e)
+            set_task_result(upload_results, task_id, {"status": "failed", "error": str(e)})
+        finally:
+            upload_copy.close()
     
     background_tasks.add_task(process_upload)
     return {"task_id": task_id, "status": "processing"}
 
 @app.get("/api/upload-status/{task_id}")
 async def get_upload_status(task_id: str):
-    if task_id not in upload_results:
+    result = get_task_result(upload_results, task_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    result = upload_results[task_id]
-    
-    if result["status"] in ["completed", "failed"]:
-        upload_results.pop(task_id, None)
-    
     return result
 
 @app.post("/api/analyze-resume")
@@ -118,15 +237,19 @@ async def analyze_resume(
     if not job_description.strip():
         logger.error("Job description is empty")
         raise HTTPException(status_code=400, detail="Job description cannot be empty")
-    if len(resume_text) > 10000:
-        logger.error(f"Resume text too long: {len(resume_text)} chars")
-        raise HTTPException(status_code=400, detail="Resume text exceeds 10000 characters")
+    if len(resume_text) > MAX_TEXT_CHARS:
+        logger.error("Resume text too long: %d chars", len(resume_text))
+        raise HTTPException(status_code=400, detail=f"Resume text exceeds {MAX_TEXT_CHARS} characters")
     
     try:
         async def perform_analysis():
-            keywords = await ai_analyzer.extract_keywords_advanced(job_description, resume_text)
+            sections = sections_for(resume_text)
+            # Keyword extraction and bullet improvement are independent Ollama calls
+            keywords, improved_bullets = await asyncio.gather(
+                ai_analyzer.extract_keywords_advanced(job_description, resume_text),
+                ai_analyzer.improve_bullets_advanced(sections, job_description),
+            )
             match_score = await ai_analyzer.calculate_advanced_match_score(resume_text, keywords, job_description)
-            improved_bullets = await ai_analyzer.improve_bullets_advanced(doc_processor.parse_resume_sections(resume_text), job_description)
             
             return keywords, match_score, improved_bullets
         
@@ -160,11 +283,11 @@ async def analyze_resume(
             "suggestions": match_score['recommendations']
         }
         
-        return JSONResponse(content=analysis)
+        return ORJSONResponse(content=analysis)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Analysis error: {str(e)}")
+        logger.exception("Analysis error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error analyzing resume: {str(e)}")
 
 @app.post("/api/analyze-resume-async")
@@ -174,13 +297,17 @@ async def analyze_resume_async(
     job_description: str = Form(...)
 ):
     task_id = str(uuid.uuid4())
-    analysis_results[task_id] = {"status": "processing", "result": None}
+    set_task_result(analysis_results, task_id, {"status": "processing", "result": None})
     
     async def background_analysis():
         try:
-            keywords = await ai_analyzer.extract_keywords_advanced(job_description, resume_text)
+            sections = sections_for(resume_text)
+            # Keyword extraction and bullet improvement are independent Ollama calls
+            keywords, improved_bullets = await asyncio.gather(
+                ai_analyzer.extract_keywords_advanced(job_description, resume_text),
+                ai_analyzer.improve_bullets_advanced(sections, job_description),
+            )
             match_score = await ai_analyzer.calculate_advanced_match_score(resume_text, keywords, job_description)
-            improved_bullets = await ai_analyzer.improve_bullets_advanced(doc_processor.parse_resume_sections(resume_text), job_description)
             
             analysis = {
                 "match_score": match_score['overall_score'],
@@ -189,24 +316,20 @@ async def analyze_resume_async(
                 "suggestions": match_score['recommendations']
             }
             
-            analysis_results[task_id] = {"status": "completed", "result": analysis}
+            set_task_result(analysis_results, task_id, {"status": "completed", "result": analysis})
         except Exception as e:
-            logger.error(f"Async analysis error: {str(e)}")
-            analysis_results[task_id] = {"status": "failed", "error": str(e)}
+            logger.exception("Async analysis error: %s", e)
+            set_task_result(analysis_results, task_id, {"status": "failed", "error": str(e)})
     
     background_tasks.add_task(background_analysis)
     return {"task_id": task_id, "status": "processing"}
 
 @app.get("/api/analysis-status/{task_id}")
 async def get_analysis_status(task_id: str):
-    if task_id not in analysis_results:
+    result = get_task_result(analysis_results, task_id)
+    if result is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    result = analysis_results[task_id]
-    
-    if result["status"] in ["completed", "failed"]:
-        analysis_results.pop(task_id, None)
-    
     return result
 
 @app.post("/api/generate-enhanced-resume")
@@ -217,15 +340,15 @@ async def generate_enhanced_resume(
     logger.info("Generating enhanced resume")
     try:
         try:
-            improvements_list = json.loads(improvements)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
+            improvements_list = orjson.loads(improvements)
+        except orjson.JSONDecodeError as e:
+            logger.error("JSON decode error: %s", e)
             raise HTTPException(status_code=400, detail=f"Invalid JSON format for improvements: {str(e)}")
 
-        sections = doc_processor.parse_resume_sections(original_text)
+        sections = sections_for(original_text)
 
         def normalize_text(text: str) -> str:
-            return re.sub(r'^\s*[•-]\s*', '', text).strip().lower()
+            return _BULLET_PREFIX_RE.sub('', text).strip().lower()
 
         enhanced_experience = sections.get('experience', '')
         replacements_made = False
@@ -270,7 +393,7 @@ async def generate_enhanced_resume(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Generate resume error: {str(e)}")
+        logger.exception("Generate resume error: %s", e)
         raise HTTPException(status_code=500, detail=f"Error generating enhanced resume: {str(e)}")
 
 @app.get("/api/health")